@@ -3,21 +3,44 @@
 Money Split App - Calculate optimal money transfers to split expenses equally.
 """
 
-import logging
+import heapq
+import math
+import os
 from dataclasses import dataclass
-from datetime import datetime
-from decimal import ROUND_HALF_UP, Decimal
-from pathlib import Path
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
-import typer
-from tabulate import tabulate
+# typer, logging, datetime and pathlib are only needed by the CLI and are
+# imported where used, keeping the library functions cheap to import.
+
+# Set MONEY_SPLIT_SKIP_VALIDATION=1 to skip re-checking that a SplitResult's
+# transactions settle its balances, e.g. when they come from optimize_transactions.
+SKIP_SPLIT_VALIDATION = os.environ.get("MONEY_SPLIT_SKIP_VALIDATION") == "1"
+
+# Set MONEY_SPLIT_TABULATE=1 to render result tables with tabulate instead of
+# the built-in grid formatter.
+USE_TABULATE = os.environ.get("MONEY_SPLIT_TABULATE") == "1"
+
+
+class _FrozenSlots:
+    """Copy and pickle support for frozen dataclasses that declare __slots__."""
+
+    __slots__ = ()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # The generated __setattr__ rejects assignment on frozen instances
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
 
 
 @dataclass(frozen=True)
-class Transaction:
+class Transaction(_FrozenSlots):
     """Represents a money transfer between two people."""
 
+    __slots__ = ("payer", "recipient", "amount")
+
     payer: str
     recipient: str
     amount: float
@@ -31,15 +54,27 @@ class Transaction:
         if self.payer == self.recipient:
             raise ValueError("Payer and recipient cannot be the same person")
 
+    @classmethod
+    def _unsafe(cls, payer: str, recipient: str, amount: float) -> "Transaction":
+        """Create a transaction without validation, for already-checked values."""
+        transaction = object.__new__(cls)
+        object.__setattr__(transaction, "payer", payer)
+        object.__setattr__(transaction, "recipient", recipient)
+        object.__setattr__(transaction, "amount", amount)
+        return transaction
+
 
 @dataclass(frozen=True)
-class PaymentData:
+class PaymentData(_FrozenSlots):
     """Represents the payment information for all participants."""
 
+    # _total and _average cache the totals and are not dataclass fields
+    __slots__ = ("payments", "_total", "_average")
+
     payments: Dict[str, float]
 
     def __post_init__(self) -> None:
-        """Validate payment data."""
+        """Validate payment data and cache the totals."""
         if not self.payments:
             raise ValueError("Payments cannot be empty")
         for name, amount in self.payments.items():
@@ -48,10 +83,15 @@ class PaymentData:
             if amount < 0:
                 raise ValueError(f"Amount for {name} cannot be negative")
 
+        # Frozen dataclass, so the cached values bypass __setattr__
+        total = sum(self.payments.values())
+        object.__setattr__(self, "_total", total)
+        object.__setattr__(self, "_average", total / len(self.payments))
+
     @property
     def total_amount(self) -> float:
-        """Calculate total amount paid by all participants."""
-        return sum(self.payments.values())
+        """Get total amount paid by all participants."""
+        return self._total
 
     @property
     def participant_count(self) -> int:
@@ -60,46 +100,78 @@ class PaymentData:
 
     @property
     def average_per_person(self) -> float:
-        """Calculate average amount per person."""
-        return self.total_amount / self.participant_count
+        """Get average amount per person."""
+        return self._average
 
 
 @dataclass(frozen=True)
-class BalanceData:
+class BalanceData(_FrozenSlots):
     """Represents the calculated balances for all participants."""
 
+    # _cents caches the balances rounded to cents and is not a dataclass field
+    __slots__ = ("balances", "total_amount", "average_per_person", "_cents")
+
     balances: Dict[str, float]
     total_amount: float
     average_per_person: float
 
     def __post_init__(self) -> None:
-        """Validate balance data."""
+        """Validate balance data and round it to cents."""
         if not self.balances:
             raise ValueError("Balances cannot be empty")
         # Check that balances sum to approximately zero (within floating point precision)
-        balance_sum = sum(self.balances.values())
+        balance_sum = math.fsum(self.balances.values())
         if abs(balance_sum) > 0.01:
             raise ValueError(f"Balances must sum to zero, got {balance_sum}")
 
+        scaled = [balance * 100 for balance in self.balances.values()]
+
+        # Rounding each balance on its own can leave the cents a few short of
+        # zero, so floor them all and hand the leftover cents (the total rounded
+        # half-up) to the largest fractional parts. Everyone then stays within a
+        # cent of their balance.
+        cents = [math.floor(value) for value in scaled]
+        leftover = math.floor(math.fsum(scaled) + 0.5) - sum(cents)
+        by_remainder = sorted(range(len(cents)), key=lambda i: cents[i] - scaled[i])
+        for i in by_remainder[:leftover]:
+            cents[i] += 1
+
+        # Frozen dataclass, so the cached value bypasses __setattr__
+        object.__setattr__(self, "_cents", dict(zip(self.balances, cents)))
+
+    @property
+    def cents(self) -> Dict[str, int]:
+        """Get balances rounded to whole cents; these decide who pays whom."""
+        return self._cents
+
     @property
     def debtors(self) -> Dict[str, float]:
-        """Get people who owe money (negative balances)."""
-        return {
-            name: -balance for name, balance in self.balances.items() if balance < -0.01
-        }
+        """Get people who owe at least a cent (negative balances)."""
+        return {name: -cents / 100 for name, cents in self._cents.items() if cents < 0}
 
     @property
     def creditors(self) -> Dict[str, float]:
-        """Get people who are owed money (positive balances)."""
-        return {
-            name: balance for name, balance in self.balances.items() if balance > 0.01
-        }
+        """Get people who are owed at least a cent (positive balances)."""
+        return {name: cents / 100 for name, cents in self._cents.items() if cents > 0}
+
+    def _split(self) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """Split balances into debtors and creditors in cents, in a single pass."""
+        debtors = []
+        creditors = []
+        for name, cents in self._cents.items():
+            if cents < 0:
+                debtors.append((name, -cents))
+            elif cents > 0:
+                creditors.append((name, cents))
+        return debtors, creditors
 
 
 @dataclass(frozen=True)
-class SplitResult:
+class SplitResult(_FrozenSlots):
     """Represents the complete result of the money split calculation."""
 
+    __slots__ = ("payment_data", "balance_data", "transactions")
+
     payment_data: PaymentData
     balance_data: BalanceData
     transactions: List[Transaction]
@@ -109,16 +181,17 @@ class SplitResult:
         if not self.payment_data or not self.balance_data:
             raise ValueError("Payment data and balance data are required")
         # Verify that transactions balance out
-        if self.transactions:
-            net_changes = dict.fromkeys(self.payment_data.payments.keys(), 0.0)
+        if self.transactions and not SKIP_SPLIT_VALIDATION:
+            net_changes = dict.fromkeys(self.payment_data.payments, 0.0)
             for transaction in self.transactions:
-                net_changes[transaction.payer] -= transaction.amount
-                net_changes[transaction.recipient] += transaction.amount
+                amount = transaction.amount
+                net_changes[transaction.payer] -= amount
+                net_changes[transaction.recipient] += amount
 
             # Check that net changes match balances
-            for name in self.payment_data.payments.keys():
-                expected_change = self.balance_data.balances[name]
-                actual_change = net_changes[name]
+            balances = self.balance_data.balances
+            for name, actual_change in net_changes.items():
+                expected_change = balances[name]
                 if abs(actual_change - expected_change) > 0.01:
                     raise ValueError(
                         f"Transaction mismatch for {name}: expected {expected_change}, got {actual_change}"
@@ -142,6 +215,8 @@ def collect_payments() -> PaymentData:
     Returns:
         Dictionary mapping person names to amounts they paid
     """
+    import typer
+
     payments = {}
 
     typer.echo("Enter payment information (type 'done' when finished):")
@@ -190,67 +265,255 @@ def calculate_balances(payment_data: PaymentData) -> BalanceData:
     Returns:
         BalanceData containing calculated balances and summary information
     """
-    balances = {}
-    for name, amount_paid in payment_data.payments.items():
-        balances[name] = amount_paid - payment_data.average_per_person
+    average = payment_data.average_per_person
+
+    balances = {
+        name: amount_paid - average
+        for name, amount_paid in payment_data.payments.items()
+    }
 
     return BalanceData(
         balances=balances,
         total_amount=payment_data.total_amount,
-        average_per_person=payment_data.average_per_person,
+        average_per_person=average,
+    )
+
+
+# Largest number of non-zero balances settled by the exact solver. The subset
+# DP visits all 2**n subsets, so larger groups fall back to the greedy settlement.
+MAX_EXACT_PARTICIPANTS = 12
+
+
+def _zero_sum_blocks(values: List[int]) -> List[List[int]]:
+    """
+    Partition balances into the largest number of disjoint zero-sum groups.
+
+    Args:
+        values: Balances in integer cents
+
+    Returns:
+        Lists of indices into values; every group except possibly the first sums
+        to zero (the first absorbs any rounding remainder)
+    """
+    full = (1 << len(values)) - 1
+    sums = [0] * (full + 1)
+    best = [0] * (full + 1)
+
+    # best[mask] is the most zero-sum groups the members of mask can be split into
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + values[low.bit_length() - 1]
+        most = 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            most = max(most, best[mask ^ bit])
+            rest ^= bit
+        best[mask] = most + (sums[mask] == 0)
+
+    # Peel members off one at a time, closing a group at every zero-sum remainder
+    blocks = []
+    block: List[int] = []
+    mask = full
+    while mask:
+        rest = mask
+        pick = rest & -rest
+        while rest:
+            bit = rest & -rest
+            if best[mask ^ bit] > best[mask ^ pick]:
+                pick = bit
+            rest ^= bit
+        block.append(pick.bit_length() - 1)
+        mask ^= pick
+        if mask and sums[mask] == 0:
+            blocks.append(block)
+            block = []
+    blocks.append(block)
+
+    return blocks
+
+
+def _greedy_core(debts: List[int], credits: List[int]) -> List[Tuple[int, int, int]]:
+    """
+    Repeatedly pair the largest remaining debt with the largest remaining credit.
+
+    Args:
+        debts: Cents owed by each debtor
+        credits: Cents owed to each creditor
+
+    Returns:
+        List of (debtor index, creditor index, cents) triples, one per transfer
+    """
+    # Max-heaps of (-cents, index) so the largest debt/credit pops first
+    debt_heap = [(-debt, i) for i, debt in enumerate(debts)]
+    credit_heap = [(-credit, j) for j, credit in enumerate(credits)]
+    heapq.heapify(debt_heap)
+    heapq.heapify(credit_heap)
+
+    transfers: List[Tuple[int, int, int]] = []
+    if not debt_heap or not credit_heap:
+        return transfers
+
+    # Local bindings; the current debtor and creditor live in scalars and only
+    # the exhausted side goes back to its heap
+    append = transfers.append
+    heappop = heapq.heappop
+    heappushpop = heapq.heappushpop
+
+    neg_debt, i = heappop(debt_heap)
+    neg_credit, j = heappop(credit_heap)
+    debt, credit = -neg_debt, -neg_credit
+
+    while True:
+        if debt < credit:
+            # Debtor settled; the creditor's remainder competes with the rest
+            append((i, j, debt))
+            if not debt_heap:
+                break
+            neg_debt, i = heappop(debt_heap)
+            neg_credit, j = heappushpop(credit_heap, (debt - credit, j))
+        elif credit < debt:
+            # Creditor settled; the debtor's remainder competes with the rest
+            append((i, j, credit))
+            if not credit_heap:
+                break
+            neg_credit, j = heappop(credit_heap)
+            neg_debt, i = heappushpop(debt_heap, (credit - debt, i))
+        else:
+            append((i, j, debt))
+            if not debt_heap or not credit_heap:
+                break
+            neg_debt, i = heappop(debt_heap)
+            neg_credit, j = heappop(credit_heap)
+        debt, credit = -neg_debt, -neg_credit
+
+    return transfers
+
+
+def _settle_greedy(
+    debtors: List[Tuple[str, int]], creditors: List[Tuple[str, int]]
+) -> List[Transaction]:
+    """
+    Settle debts by repeatedly pairing the largest debtor with the largest creditor.
+
+    Args:
+        debtors: (name, cents owed) pairs for people who owe money
+        creditors: (name, cents owed to them) pairs for people who are owed money
+
+    Returns:
+        List of Transaction objects settling the given balances
+    """
+    transfers = _greedy_core(
+        [debt for _, debt in debtors], [credit for _, credit in creditors]
     )
 
+    return [
+        # Debtors and creditors are distinct and every transfer is positive
+        Transaction._unsafe(debtors[i][0], creditors[j][0], amount / 100.0)
+        for i, j, amount in transfers
+    ]
+
 
 def optimize_transactions(balance_data: BalanceData) -> List[Transaction]:
     """
     Calculate the minimum number of transactions needed to settle all debts.
 
+    Settling a group that sums to zero takes one transaction less than its size,
+    so the minimum is reached by splitting everyone into as many zero-sum groups
+    as possible. Up to MAX_EXACT_PARTICIPANTS people this split is found exactly;
+    beyond that the whole group is settled greedily.
+
     Args:
         balance_data: BalanceData containing calculated balances
 
     Returns:
         List of Transaction objects representing optimal transfers
     """
-    # Get debtors and creditors from balance data
-    debtors = [(name, debt) for name, debt in balance_data.debtors.items()]
-    creditors = [(name, credit) for name, credit in balance_data.creditors.items()]
+    # Work in integer cents so amounts and zero-sum checks are exact
+    debtors, creditors = balance_data._split()
+
+    debtor_count = len(debtors)
+    if debtor_count + len(creditors) > MAX_EXACT_PARTICIPANTS:
+        return _settle_greedy(debtors, creditors)
+
+    values = [-debt for _, debt in debtors] + [credit for _, credit in creditors]
 
     transactions = []
+    for block in _zero_sum_blocks(values):
+        transactions.extend(
+            _settle_greedy(
+                [debtors[i] for i in block if i < debtor_count],
+                [creditors[i - debtor_count] for i in block if i >= debtor_count],
+            )
+        )
 
-    while debtors and creditors:
-        # Sort by amount (largest first)
-        debtors.sort(key=lambda x: x[1], reverse=True)
-        creditors.sort(key=lambda x: x[1], reverse=True)
+    return transactions
 
-        debtor_name, debt = debtors[0]
-        creditor_name, credit = creditors[0]
 
-        # Transfer minimum of debt and credit
-        amount = min(debt, credit)
+def _is_plain_cell(cell: str, display_width: Callable[[str], int]) -> bool:
+    """Check whether a cell renders as left-aligned, single-line text in tabulate."""
+    if "\n" in cell or cell != cell.strip() or display_width(cell) < 0:
+        return False
+    # tabulate right-aligns anything that parses as a number
+    for parse in (float, lambda text: int(text, 0)):
+        try:
+            parse(cell.replace(",", ""))
+        except ValueError:
+            continue
+        return False
+    return True
 
-        # Round to 2 decimal places
-        amount = float(
-            Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        )
 
-        transactions.append(Transaction(debtor_name, creditor_name, amount))
+def _format_grid(headers: List[str], rows: List[List[str]]) -> str:
+    """
+    Format text cells as a grid table, matching tabulate's "grid" layout.
 
-        # Update balances
-        new_debt = debt - amount
-        new_credit = credit - amount
+    Single-line, non-numeric cells are laid out here, measuring display width
+    with wcwidth when it is installed (as tabulate does). Tables with
+    multi-line, padded, number-like or non-printable cells, which tabulate
+    splits, strips or right-aligns, are handed to tabulate.
 
-        # Update or remove entries
-        if new_debt > 0.01:
-            debtors[0] = (debtor_name, new_debt)
-        else:
-            debtors.pop(0)
+    Args:
+        headers: Column headers
+        rows: Table rows, one string per column
 
-        if new_credit > 0.01:
-            creditors[0] = (creditor_name, new_credit)
-        else:
-            creditors.pop(0)
+    Returns:
+        The formatted table as a single string
+    """
+    try:
+        from wcwidth import wcswidth as display_width
+    except ImportError:
+        display_width = len
 
-    return transactions
+    cells = headers + [cell for row in rows for cell in row]
+    if USE_TABULATE or not all(_is_plain_cell(cell, display_width) for cell in cells):
+        from tabulate import tabulate
+
+        return tabulate(rows, headers=headers, tablefmt="grid")
+
+    # Like tabulate, leave two spaces of padding after each header
+    widths = [
+        max([display_width(header) + 2] + [display_width(row[i]) for row in rows])
+        for i, header in enumerate(headers)
+    ]
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+
+    def format_row(cells: List[str]) -> str:
+        return (
+            "| "
+            + " | ".join(
+                cell + " " * (width - display_width(cell))
+                for cell, width in zip(cells, widths)
+            )
+            + " |"
+        )
+
+    lines = [border, format_row(headers), border.replace("-", "=")]
+    for row in rows:
+        lines.append(format_row(row))
+        lines.append(border)
+
+    return "\n".join(lines)
 
 
 def display_results(split_result: SplitResult) -> None:
@@ -260,75 +523,81 @@ def display_results(split_result: SplitResult) -> None:
     Args:
         split_result: SplitResult containing all calculation results
     """
+    import typer
+
     payment_data = split_result.payment_data
     balance_data = split_result.balance_data
     transactions = split_result.transactions
 
-    typer.echo()
-    typer.echo("=" * 50)
-    typer.echo("MONEY SPLIT RESULTS")
-    typer.echo("=" * 50)
-
-    typer.echo(f"Total paid: €{balance_data.total_amount:.2f}")
-    typer.echo(f"Average per person: €{balance_data.average_per_person:.2f}")
-    typer.echo(f"Participants: {payment_data.participant_count}")
-    typer.echo()
+    # Formatted once, the average is repeated on every summary row
+    average = f"€{balance_data.average_per_person:.2f}"
+
+    # Collect the whole report and echo it at once
+    lines = [
+        "",
+        "=" * 50,
+        "MONEY SPLIT RESULTS",
+        "=" * 50,
+        f"Total paid: €{balance_data.total_amount:.2f}",
+        f"Average per person: {average}",
+        f"Participants: {payment_data.participant_count}",
+        "",
+    ]
 
     if not transactions:
-        typer.echo(
+        lines.append(
             "✅ No transactions needed - everyone paid exactly the right amount!"
         )
+        typer.echo("\n".join(lines))
         return
 
-    typer.echo("💸 Transactions needed:")
-    typer.echo("-" * 25)
+    lines.append("💸 Transactions needed:")
+    lines.append("-" * 25)
 
     # Create table for transactions
     transaction_data = [
         [t.payer, t.recipient, f"€{t.amount:.2f}"] for t in transactions
     ]
 
-    typer.echo(
-        tabulate(
-            transaction_data, headers=["Payer", "Recipient", "Amount"], tablefmt="grid"
-        )
-    )
+    lines.append(_format_grid(["Payer", "Recipient", "Amount"], transaction_data))
 
-    typer.echo()
-    typer.echo("📊 Summary:")
-    typer.echo("-" * 15)
+    lines.append("")
+    lines.append("📊 Summary:")
+    lines.append("-" * 15)
 
     # Create table for summary
-    summary_data = []
-    for name in sorted(payment_data.payments.keys()):
-        balance = balance_data.balances[name]
-        paid = payment_data.payments[name]
-
-        if balance > 0.01:
-            status = f"Receives €{balance:.2f}"
-        elif balance < -0.01:
-            status = f"Pays €{-balance:.2f}"
-        else:
-            status = "Even"
+    names = sorted(payment_data.payments)
+    # Status comes from the same rounded cents the transactions are built from
+    cents = [balance_data.cents[name] for name in names]
+    paid = [payment_data.payments[name] for name in names]
+    statuses = [
+        f"Receives €{amount / 100:.2f}"
+        if amount > 0
+        else f"Pays €{-amount / 100:.2f}"
+        if amount < 0
+        else "Even"
+        for amount in cents
+    ]
 
-        summary_data.append(
-            [name, f"€{paid:.2f}", f"€{balance_data.average_per_person:.2f}", status]
-        )
+    summary_data = [
+        [name, f"€{amount:.2f}", average, status]
+        for name, amount, status in zip(names, paid, statuses)
+    ]
 
-    typer.echo(
-        tabulate(
-            summary_data,
-            headers=["Name", "Paid", "Should Pay", "Status"],
-            tablefmt="grid",
-        )
-    )
+    lines.append(_format_grid(["Name", "Paid", "Should Pay", "Status"], summary_data))
 
-    typer.echo()
-    typer.echo(f"Total transactions: {len(transactions)}")
+    lines.append("")
+    lines.append(f"Total transactions: {len(transactions)}")
+
+    typer.echo("\n".join(lines))
 
 
 def setup_logging() -> None:
     """Set up logging to file with timestamps."""
+    import logging
+    from datetime import datetime
+    from pathlib import Path
+
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
 
@@ -339,7 +608,7 @@ def setup_logging() -> None:
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s",
         handlers=[
-            logging.FileHandler(log_file),
+            logging.FileHandler(log_file, delay=True),
             logging.StreamHandler(),  # Also log to console
         ],
     )
@@ -349,35 +618,47 @@ def setup_logging() -> None:
 
 def log_results(split_result: SplitResult) -> None:
     """Log the results to file."""
+    import logging
+
     payment_data = split_result.payment_data
     balance_data = split_result.balance_data
     transactions = split_result.transactions
 
-    logging.info("=== MONEY SPLIT RESULTS ===")
-    logging.info(f"Total paid: €{balance_data.total_amount:.2f}")
-    logging.info(f"Average per person: €{balance_data.average_per_person:.2f}")
-    logging.info(f"Participants: {payment_data.participant_count}")
+    # Build the whole report and log it as a single record
+    lines = [
+        "=== MONEY SPLIT RESULTS ===",
+        f"Total paid: €{balance_data.total_amount:.2f}",
+        f"Average per person: €{balance_data.average_per_person:.2f}",
+        f"Participants: {payment_data.participant_count}",
+    ]
 
     # Log payments
-    logging.info("=== PAYMENTS ===")
-    for name, amount in payment_data.payments.items():
-        logging.info(f"{name}: €{amount:.2f}")
+    lines.append("=== PAYMENTS ===")
+    lines.extend(
+        f"{name}: €{amount:.2f}" for name, amount in payment_data.payments.items()
+    )
 
     # Log transactions
     if transactions:
-        logging.info("=== TRANSACTIONS ===")
-        for transaction in transactions:
-            logging.info(
-                f"{transaction.payer} pays {transaction.recipient}: €{transaction.amount:.2f}"
-            )
+        lines.append("=== TRANSACTIONS ===")
+        lines.extend(
+            f"{transaction.payer} pays {transaction.recipient}: €{transaction.amount:.2f}"
+            for transaction in transactions
+        )
     else:
-        logging.info("No transactions needed - everyone paid equally")
+        lines.append("No transactions needed - everyone paid equally")
+
+    lines.append(f"Total transactions: {len(transactions)}")
 
-    logging.info(f"Total transactions: {len(transactions)}")
+    logging.info("\n".join(lines))
 
 
 def main():
     """Main entry point for the Money Split App."""
+    import logging
+
+    import typer
+
     setup_logging()
 
     typer.echo("💰 Money Split App")
@@ -437,6 +718,8 @@ def main():
 
 
 if __name__ == "__main__":
+    import typer
+
     try:
         main()
     except KeyboardInterrupt:
@@ -5,12 +5,15 @@ Test suite for the Money Split App
 
 import pytest
 
+from src import app
 from src.app import (
     BalanceData,
     PaymentData,
     SplitResult,
     Transaction,
+    _format_grid,
     calculate_balances,
+    display_results,
     optimize_transactions,
 )
 
@@ -104,6 +107,16 @@ class TestTransaction:
         with pytest.raises(FrozenInstanceError):
             t.amount = 30.0  # type: ignore
 
+    def test_transaction_copy_and_pickle(self):
+        """Test that slotted, frozen Transactions can be copied and pickled."""
+        import copy
+        import pickle
+
+        t = Transaction("Alice", "Bob", 25.50)
+        assert not hasattr(t, "__dict__")
+        assert copy.copy(t) == t
+        assert pickle.loads(pickle.dumps(t)) == t
+
     def test_transaction_equality(self):
         """Test Transaction equality."""
         t1 = Transaction("Alice", "Bob", 25.50)
@@ -113,6 +126,11 @@ class TestTransaction:
         assert t1 == t2
         assert t1 != t3
 
+    def test_transaction_unsafe_constructor(self):
+        """Test that the unchecked constructor builds an equal Transaction."""
+        t = Transaction._unsafe("Alice", "Bob", 25.50)
+        assert t == Transaction("Alice", "Bob", 25.50)
+
 
 class TestCalculateBalances:
     """Test the calculate_balances function."""
@@ -250,6 +268,41 @@ class TestOptimizeTransactions:
         for transaction in result:
             assert transaction.amount == round(transaction.amount, 2)
 
+    def test_zero_sum_groups_settled_separately(self):
+        """Test that independent zero-sum groups need fewer transactions."""
+        balance_data = BalanceData(
+            balances={
+                "Alice": 8.0,
+                "Bob": 7.0,
+                "Charlie": -6.0,
+                "Dave": -7.0,
+                "Eve": -2.0,
+            },
+            total_amount=150.0,
+            average_per_person=30.0,
+        )
+        result = optimize_transactions(balance_data)
+
+        # Dave settles with Bob alone; Charlie and Eve settle with Alice
+        assert len(result) == 3
+        assert Transaction("Dave", "Bob", 7.0) in result
+
+    def test_large_group_falls_back_to_greedy(self):
+        """Test that groups above the exact solver limit are still settled."""
+        balances = {f"Person{i}": float(i + 1) for i in range(8)}
+        balances.update({f"Debtor{i}": -float(i + 1) for i in range(8)})
+        balance_data = BalanceData(
+            balances=balances, total_amount=160.0, average_per_person=10.0
+        )
+        result = optimize_transactions(balance_data)
+
+        net = dict.fromkeys(balances, 0.0)
+        for transaction in result:
+            net[transaction.payer] -= transaction.amount
+            net[transaction.recipient] += transaction.amount
+        assert net == balances
+        assert len(result) <= len(balances) - 1
+
 
 class TestSplitResult:
     """Test the SplitResult dataclass."""
@@ -295,6 +348,68 @@ class TestSplitResult:
         assert result.is_balanced
         assert result.transaction_count == 0
 
+    def test_split_result_mismatch_validation(self):
+        """Test validation that transactions settle the balances."""
+        payment_data = PaymentData(payments={"Alice": 60.0, "Bob": 20.0})
+        balance_data = BalanceData(
+            balances={"Alice": 20.0, "Bob": -20.0},
+            total_amount=80.0,
+            average_per_person=40.0,
+        )
+
+        with pytest.raises(ValueError, match="Transaction mismatch for Alice"):
+            SplitResult(
+                payment_data=payment_data,
+                balance_data=balance_data,
+                transactions=[Transaction("Bob", "Alice", 10.0)],
+            )
+
+    def test_split_result_skip_validation(self, monkeypatch):
+        """Test that validation can be switched off for trusted transactions."""
+        monkeypatch.setattr(app, "SKIP_SPLIT_VALIDATION", True)
+        payment_data = PaymentData(payments={"Alice": 60.0, "Bob": 20.0})
+        balance_data = BalanceData(
+            balances={"Alice": 20.0, "Bob": -20.0},
+            total_amount=80.0,
+            average_per_person=40.0,
+        )
+
+        result = SplitResult(
+            payment_data=payment_data,
+            balance_data=balance_data,
+            transactions=[Transaction("Bob", "Alice", 10.0)],
+        )
+        assert result.transaction_count == 1
+
+
+class TestFormatGrid:
+    """Test the _format_grid table formatter."""
+
+    def test_matches_tabulate_grid(self):
+        """Test that the built-in formatter matches tabulate's grid layout."""
+        from tabulate import tabulate
+
+        headers = ["Name", "Paid", "Status"]
+        rows = [
+            ["Alice", "€100.00", "Receives €50.00"],
+            ["Zoë 日本", "€0.00", "Pays €25.00"],
+            ["Bob", "€0.00", "Even"],
+        ]
+
+        assert _format_grid(headers, rows) == tabulate(
+            rows, headers=headers, tablefmt="grid"
+        )
+
+    def test_numeric_and_multiline_cells_match_tabulate(self):
+        """Test cells tabulate aligns or splits differently from plain text."""
+        from tabulate import tabulate
+
+        headers = ["Name", "Paid"]
+        for rows in ([["1", "€10.00"], ["10", "€0.00"]], [["Bob\nSmith", "€5.00"]]):
+            assert _format_grid(headers, rows) == tabulate(
+                rows, headers=headers, tablefmt="grid"
+            )
+
 
 class TestIntegration:
     """Integration tests for the complete workflow."""
@@ -352,6 +467,44 @@ class TestIntegration:
         for name in payment_data.payments.keys():
             assert abs(net_changes[name] - balance_data.balances[name]) < 0.01
 
+    def test_complete_workflow_half_cent_balances(self):
+        """Test that rounding balances to cents still settles everyone."""
+        payment_data = PaymentData(
+            payments={"Alice": 100.0, "Bob": 0.0, "Charlie": 12.5, "Dave": 30.0}
+        )
+        balance_data = calculate_balances(payment_data)
+        transactions = optimize_transactions(balance_data)
+
+        # Would raise if anyone's transfers drifted more than a cent
+        split_result = SplitResult(
+            payment_data=payment_data,
+            balance_data=balance_data,
+            transactions=transactions,
+        )
+        assert split_result.transaction_count == 3
+
+    def test_one_cent_difference_is_settled(self, capsys):
+        """Test that a one-cent balance is treated the same everywhere."""
+        payment_data = PaymentData(payments={"A": 10.0, "B": 10.02})
+        balance_data = calculate_balances(payment_data)
+        transactions = optimize_transactions(balance_data)
+        split_result = SplitResult(
+            payment_data=payment_data,
+            balance_data=balance_data,
+            transactions=transactions,
+        )
+
+        assert transactions == [Transaction("A", "B", 0.01)]
+        assert balance_data.debtors == {"A": 0.01}
+        assert balance_data.creditors == {"B": 0.01}
+        assert not split_result.is_balanced
+
+        display_results(split_result)
+        output = capsys.readouterr().out
+        assert "Pays €0.01" in output
+        assert "Receives €0.01" in output
+        assert "Even" not in output
+
     def test_edge_case_one_person(self):
         """Test edge case with only one person."""
         payment_data = PaymentData(payments={"Alice": 50.0})